@@ -3,12 +3,25 @@ API для работы с бронированием трансфера: рас
 """
 import json
 import os
-from datetime import datetime
+from datetime import date, datetime
 import psycopg2
-from psycopg2.extras import RealDictCursor
+from query_stats import StatsCursor, StatsRealDictCursor, stats_response, maybe_dump
+
+STATUS_TRANSITIONS = {
+    'pending': ('confirmed', 'cancelled'),
+    'confirmed': ('in_progress', 'cancelled'),
+    'in_progress': ('completed', 'cancelled'),
+    'completed': (),
+    'cancelled': (),
+}
+
+# Окно секций: совпадает с bookings_ensure_partition в db_migrations/V0002
+PARTITION_MONTHS_AHEAD = 12
+MIN_KEEP_MONTHS = 3
+PG_INT_MAX = 2147483647
 
 def get_db_connection():
-    return psycopg2.connect(os.environ['DATABASE_URL'])
+    return psycopg2.connect(os.environ['DATABASE_URL'], cursor_factory=StatsCursor)
 
 def handler(event: dict, context) -> dict:
     method = event.get('httpMethod', 'GET')
@@ -27,8 +40,16 @@ def handler(event: dict, context) -> dict:
     
     try:
         if method == 'GET':
+            query_params = event.get('queryStringParameters') or {}
+            if query_params.get('stats'):
+                return stats_response(event)
             return get_bookings(event)
         elif method == 'POST':
+            query_params = event.get('queryStringParameters') or {}
+            if query_params.get('stats'):
+                return stats_response(event)
+            if query_params.get('action') == 'maintenance':
+                return maintain_partitions(event)
             return create_booking(event)
         elif method == 'PUT':
             return update_booking(event)
@@ -46,33 +67,45 @@ def handler(event: dict, context) -> dict:
             'body': json.dumps({'error': str(e)}),
             'isBase64Encoded': False
         }
+    finally:
+        maybe_dump()
 
 def get_bookings(event: dict) -> dict:
     conn = get_db_connection()
-    cur = conn.cursor(cursor_factory=RealDictCursor)
+    cur = conn.cursor(cursor_factory=StatsRealDictCursor)
     
     query_params = event.get('queryStringParameters') or {}
     status_filter = query_params.get('status')
     
+    # По умолчанию читаем только горячие секции; архив подключается явно через ?archived=true
+    source = 'bookings'
+    if query_params.get('archived') == 'true':
+        source = """(
+                SELECT * FROM bookings
+                UNION ALL
+                SELECT r.* FROM bookings_archive a,
+                       jsonb_populate_recordset(NULL::bookings, a.payload) r
+            )"""
+    
     if status_filter:
-        cur.execute("""
+        cur.execute(f"""
             SELECT b.*, f.name as fleet_name, f.category as fleet_category,
                    r.from_location, r.to_location, r.base_price
-            FROM bookings b
+            FROM {source} b
             LEFT JOIN fleet f ON b.fleet_id = f.id
             LEFT JOIN routes r ON b.route_id = r.id
             WHERE b.status = %s
             ORDER BY b.created_at DESC
-        """, (status_filter,))
+        """, (status_filter,), analyze=True)
     else:
-        cur.execute("""
+        cur.execute(f"""
             SELECT b.*, f.name as fleet_name, f.category as fleet_category,
                    r.from_location, r.to_location, r.base_price
-            FROM bookings b
+            FROM {source} b
             LEFT JOIN fleet f ON b.fleet_id = f.id
             LEFT JOIN routes r ON b.route_id = r.id
             ORDER BY b.created_at DESC
-        """)
+        """, analyze=True)
     
     bookings = cur.fetchall()
     cur.close()
@@ -115,14 +148,26 @@ def create_booking(event: dict) -> dict:
                 'isBase64Encoded': False
             }
     
+    try:
+        pickup_date = date.fromisoformat(str(data['pickup_date']))
+    except ValueError:
+        pickup_date = None
+    if pickup_date is None or pickup_date >= latest_pickup_date():
+        return {
+            'statusCode': 400,
+            'headers': {'Content-Type': 'application/json', 'Access-Control-Allow-Origin': '*'},
+            'body': json.dumps({'error': f'pickup_date must be a date earlier than {latest_pickup_date().isoformat()}'}),
+            'isBase64Encoded': False
+        }
+    
     conn = get_db_connection()
-    cur = conn.cursor(cursor_factory=RealDictCursor)
+    cur = conn.cursor(cursor_factory=StatsRealDictCursor)
     
     cur.execute("""
         SELECT id, base_price FROM routes
         WHERE from_location = %s AND to_location = %s AND active = true
         LIMIT 1
-    """, (data['from_location'], data['to_location']))
+    """, (data['from_location'], data['to_location']), analyze=True)
     route = cur.fetchone()
     
     route_id = None
@@ -137,13 +182,26 @@ def create_booking(event: dict) -> dict:
     if fleet_id:
         cur.execute("""
             SELECT price_multiplier FROM fleet WHERE id = %s AND active = true
-        """, (fleet_id,))
+        """, (fleet_id,), analyze=True)
         fleet_data = cur.fetchone()
         if fleet_data:
             price_multiplier = float(fleet_data['price_multiplier'])
     
     total_price = base_price * price_multiplier
     
+    # Секция месяца создаётся по первой заявке; архивные месяцы новые заявки не принимают
+    cur.execute("SELECT bookings_ensure_partition(%s) AS ready", (data['pickup_date'],))
+    if not cur.fetchone()['ready']:
+        conn.rollback()
+        cur.close()
+        conn.close()
+        return {
+            'statusCode': 400,
+            'headers': {'Content-Type': 'application/json', 'Access-Control-Allow-Origin': '*'},
+            'body': json.dumps({'error': 'Pickup date falls into an archived period'}),
+            'isBase64Encoded': False
+        }
+    
     cur.execute("""
         INSERT INTO bookings 
         (customer_name, customer_phone, customer_email, from_location, to_location,
@@ -175,6 +233,7 @@ def create_booking(event: dict) -> dict:
     conn.commit()
     cur.close()
     conn.close()
+
     
     return {
         'statusCode': 201,
@@ -190,51 +249,269 @@ def create_booking(event: dict) -> dict:
 
 def update_booking(event: dict) -> dict:
     data = json.loads(event.get('body', '{}'))
-    booking_id = data.get('id')
     
-    if not booking_id:
+    items, error = parse_booking_items(data)
+    
+    if error:
         return {
             'statusCode': 400,
             'headers': {'Content-Type': 'application/json', 'Access-Control-Allow-Origin': '*'},
-            'body': json.dumps({'error': 'Missing booking id'}),
+            'body': json.dumps({'error': error}),
             'isBase64Encoded': False
         }
     
-    conn = get_db_connection()
-    cur = conn.cursor()
-    
-    update_fields = []
-    values = []
+    # Пакетный режим: {"ids": [...]} или {"items": [{"id": ..., "version": ...}]}
+    bulk = 'ids' in data or 'items' in data
     
-    if 'status' in data:
-        update_fields.append('status = %s')
-        values.append(data['status'])
+    if 'status' not in data and 'notes' not in data:
+        return {
+            'statusCode': 400,
+            'headers': {'Content-Type': 'application/json', 'Access-Control-Allow-Origin': '*'},
+            'body': json.dumps({'error': 'No fields to update'}),
+            'isBase64Encoded': False
+        }
     
-    if 'notes' in data:
-        update_fields.append('notes = %s')
-        values.append(data['notes'])
+    if 'status' in data and (not isinstance(data['status'], str) or data['status'] not in STATUS_TRANSITIONS):
+        return {
+            'statusCode': 400,
+            'headers': {'Content-Type': 'application/json', 'Access-Control-Allow-Origin': '*'},
+            'body': json.dumps({'error': f"Unknown status: {data['status']}"}),
+            'isBase64Encoded': False
+        }
     
-    if not update_fields:
+    if data.get('notes') is not None and not isinstance(data['notes'], str):
         return {
             'statusCode': 400,
             'headers': {'Content-Type': 'application/json', 'Access-Control-Allow-Origin': '*'},
-            'body': json.dumps({'error': 'No fields to update'}),
+            'body': json.dumps({'error': 'notes must be a string'}),
             'isBase64Encoded': False
         }
     
-    update_fields.append('updated_at = CURRENT_TIMESTAMP')
-    values.append(booking_id)
+    conn = get_db_connection()
+    cur = conn.cursor(cursor_factory=StatsRealDictCursor)
     
-    query = f"UPDATE bookings SET {', '.join(update_fields)} WHERE id = %s"
-    cur.execute(query, values)
+    results = apply_booking_changes(cur, items, data)
     
     conn.commit()
     cur.close()
     conn.close()
     
+    if bulk:
+        return {
+            'statusCode': 200,
+            'headers': {'Content-Type': 'application/json', 'Access-Control-Allow-Origin': '*'},
+            'body': json.dumps({
+                'success': all(r['result'] == 'updated' for r in results),
+                'results': results
+            }),
+            'isBase64Encoded': False
+        }
+    
+    result = results[0]
+    if result['result'] == 'updated':
+        return {
+            'statusCode': 200,
+            'headers': {'Content-Type': 'application/json', 'Access-Control-Allow-Origin': '*'},
+            'body': json.dumps({'success': True, 'id': result['id'], 'status': result['status'], 'version': result['version']}),
+            'isBase64Encoded': False
+        }
+    if result['result'] == 'not_found':
+        return {
+            'statusCode': 404,
+            'headers': {'Content-Type': 'application/json', 'Access-Control-Allow-Origin': '*'},
+            'body': json.dumps({'error': 'Booking not found'}),
+            'isBase64Encoded': False
+        }
+    return {
+        'statusCode': 409,
+        'headers': {'Content-Type': 'application/json', 'Access-Control-Allow-Origin': '*'},
+        'body': json.dumps({
+            'error': f"Cannot update booking: {result['result']}",
+            'result': result['result'],
+            'status': result['status'],
+            'version': result['version']
+        }),
+        'isBase64Encoded': False
+    }
+
+def parse_booking_items(data: dict) -> tuple:
+    """
+    Приводит id и версии из тела PUT к списку {"id": int, "version": int | None}.
+    Возвращает (items, None) или (None, текст ошибки для ответа 400).
+    """
+    if not isinstance(data, dict):
+        return None, 'Request body must be a JSON object'
+    if 'ids' in data and 'items' in data:
+        return None, 'Use either ids or items, not both'
+    
+    if 'ids' in data:
+        raw_items = data['ids']
+        if not isinstance(raw_items, list):
+            return None, 'ids must be a list of booking ids'
+        raw_items = [{'id': booking_id} for booking_id in raw_items]
+    elif 'items' in data:
+        raw_items = data['items']
+        if not isinstance(raw_items, list) or not all(isinstance(item, dict) for item in raw_items):
+            return None, 'items must be a list of objects with id and optional version'
+    else:
+        if data.get('id') is None:
+            return None, 'Missing booking id'
+        raw_items = [{'id': data['id'], 'version': data.get('version')}]
+    
+    if not raw_items:
+        return None, 'Missing booking id'
+    
+    items = []
+    for item in raw_items:
+        booking_id = parse_int(item.get('id'))
+        # Колонки id и version имеют тип INTEGER
+        if booking_id is None or not 0 < booking_id <= PG_INT_MAX:
+            return None, f"Invalid booking id: {item.get('id')}"
+        version = item.get('version')
+        if version is not None:
+            version = parse_int(version)
+            if version is None or not 0 < version <= PG_INT_MAX:
+                return None, f"Invalid version for booking {booking_id}: {item.get('version')}"
+        items.append({'id': booking_id, 'version': version})
+    
+    return items, None
+
+def apply_booking_changes(cur, items: list, data: dict) -> list:
+    """
+    Применяет изменения одним условным UPDATE без предварительного чтения.
+    Строка меняется, только если версия совпала с ожидаемой (когда она передана)
+    и переход статуса разрешён; остальные исходы определяются по заблокированной
+    строке, то есть по последней зафиксированной версии, и она же возвращается клиенту.
+    """
+    requested = {}
+    for item in items:
+        requested.setdefault(item['id'], item['version'])
+    
+    set_fields = []
+    set_values = []
+    status = data.get('status')
+    if 'status' in data:
+        set_fields.append('status = %s')
+        set_values.append(status)
+    if 'notes' in data:
+        set_fields.append('notes = %s')
+        set_values.append(data['notes'])
+    set_fields.append('version = b.version + 1')
+    set_fields.append('updated_at = CURRENT_TIMESTAMP')
+    
+    status_condition = ''
+    condition_values = []
+    if 'status' in data:
+        status_condition = 'AND b.status = ANY(%s)'
+        condition_values.append([source for source, targets in STATUS_TRANSITIONS.items() if status in targets])
+    
+    cur.execute(f"""
+        WITH req AS (
+            SELECT * FROM unnest(%s::int[], %s::int[]) AS r(id, expected_version)
+        ),
+        -- Блокируем строки в порядке id, чтобы пересекающиеся пакеты не ловили взаимоблокировку.
+        -- FOR UPDATE в READ COMMITTED отдаёт последнюю зафиксированную версию строки
+        locked AS (
+            SELECT b.id, b.status, b.version FROM bookings b JOIN req ON req.id = b.id
+            ORDER BY b.id
+            FOR UPDATE OF b
+        ),
+        updated AS (
+            UPDATE bookings b
+            SET {', '.join(set_fields)}
+            FROM req
+            WHERE b.id = req.id
+              AND b.id IN (SELECT id FROM locked)
+              AND (req.expected_version IS NULL OR b.version = req.expected_version)
+              {status_condition}
+            RETURNING b.id, b.status, b.version
+        )
+        SELECT req.id, req.expected_version,
+               u.status AS new_status, u.version AS new_version,
+               l.status AS current_status, l.version AS current_version
+        FROM req
+        LEFT JOIN updated u ON u.id = req.id
+        LEFT JOIN locked l ON l.id = req.id
+        ORDER BY req.id
+    """, [list(requested.keys()), list(requested.values())] + set_values + condition_values)
+    
+    results = []
+    for row in cur.fetchall():
+        if row['new_version'] is not None:
+            outcome = 'updated'
+        elif row['current_status'] is None:
+            outcome = 'not_found'
+        elif status is not None and status not in STATUS_TRANSITIONS.get(row['current_status'], ()):
+            outcome = 'invalid_transition'
+        else:
+            # Переход допустим из текущего статуса, значит не совпала ожидаемая версия
+            outcome = 'conflict'
+        
+        results.append({
+            'id': row['id'],
+            'result': outcome,
+            'status': row['new_status'] if outcome == 'updated' else row['current_status'],
+            'version': row['new_version'] if outcome == 'updated' else row['current_version']
+        })
+    
+    return results
+
+def maintain_partitions(event: dict) -> dict:
+    data = json.loads(event.get('body') or '{}')
+    months_ahead = parse_int(data.get('months_ahead', 3))
+    keep_months = parse_int(data.get('keep_months', MIN_KEEP_MONTHS))
+    
+    if months_ahead is None or keep_months is None:
+        return {
+            'statusCode': 400,
+            'headers': {'Content-Type': 'application/json', 'Access-Control-Allow-Origin': '*'},
+            'body': json.dumps({'error': 'months_ahead and keep_months must be integers'}),
+            'isBase64Encoded': False
+        }
+    
+    # Архив необратим, а каждая секция — отдельная таблица: параметры ограничены окном
+    months_ahead = min(max(months_ahead, 0), PARTITION_MONTHS_AHEAD)
+    keep_months = max(keep_months, MIN_KEEP_MONTHS)
+    
+    created, archived = run_partition_maintenance(months_ahead, keep_months)
+    
     return {
         'statusCode': 200,
         'headers': {'Content-Type': 'application/json', 'Access-Control-Allow-Origin': '*'},
-        'body': json.dumps({'success': True}),
+        'body': json.dumps({'success': True, 'partitions_created': created, 'partitions_archived': archived}),
         'isBase64Encoded': False
     }
+
+def run_partition_maintenance(months_ahead: int, keep_months: int) -> tuple:
+    conn = get_db_connection()
+    cur = conn.cursor(cursor_factory=StatsRealDictCursor)
+    
+    cur.execute("SELECT bookings_ensure_partitions(%s) AS created", (months_ahead,))
+    created = cur.fetchone()['created']
+    
+    cur.execute("SELECT bookings_archive_partitions(%s) AS archived", (keep_months,))
+    archived = cur.fetchone()['archived']
+    
+    conn.commit()
+    cur.close()
+    conn.close()
+    
+    return created, archived
+
+def latest_pickup_date() -> date:
+    # Первый день месяца сразу за окном секций: заявки на эту дату и позже не принимаются
+    today = date.today()
+    month_index = today.year * 12 + today.month - 1 + PARTITION_MONTHS_AHEAD + 1
+    return date(month_index // 12, month_index % 12 + 1, 1)
+
+def parse_int(value):
+    if isinstance(value, bool):
+        return None
+    if isinstance(value, int):
+        return value
+    if isinstance(value, str):
+        try:
+            return int(value)
+        except ValueError:
+            return None
+    return None
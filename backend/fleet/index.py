@@ -6,11 +6,11 @@ import os
 import base64
 import uuid
 import psycopg2
-from psycopg2.extras import RealDictCursor
+from query_stats import StatsCursor, StatsRealDictCursor, stats_response, maybe_dump
 import boto3
 
 def get_db_connection():
-    return psycopg2.connect(os.environ['DATABASE_URL'])
+    return psycopg2.connect(os.environ['DATABASE_URL'], cursor_factory=StatsCursor)
 
 def get_s3_client():
     return boto3.client(
@@ -37,8 +37,14 @@ def handler(event: dict, context) -> dict:
     
     try:
         if method == 'GET':
+            query_params = event.get('queryStringParameters') or {}
+            if query_params.get('stats'):
+                return stats_response(event)
             return get_fleet(event)
         elif method == 'POST':
+            query_params = event.get('queryStringParameters') or {}
+            if query_params.get('stats'):
+                return stats_response(event)
             return create_fleet_item(event)
         elif method == 'PUT':
             return update_fleet_item(event)
@@ -58,17 +64,19 @@ def handler(event: dict, context) -> dict:
             'body': json.dumps({'error': str(e)}),
             'isBase64Encoded': False
         }
+    finally:
+        maybe_dump()
 
 def get_fleet(event: dict) -> dict:
     conn = get_db_connection()
-    cur = conn.cursor(cursor_factory=RealDictCursor)
+    cur = conn.cursor(cursor_factory=StatsRealDictCursor)
     
     query_params = event.get('queryStringParameters') or {}
     
     if query_params.get('all') == 'true':
-        cur.execute("SELECT * FROM fleet ORDER BY category, name")
+        cur.execute("SELECT * FROM fleet ORDER BY category, name", analyze=True)
     else:
-        cur.execute("SELECT * FROM fleet WHERE active = true ORDER BY category, name")
+        cur.execute("SELECT * FROM fleet WHERE active = true ORDER BY category, name", analyze=True)
     
     fleet_items = cur.fetchall()
     cur.close()
@@ -118,7 +126,7 @@ def create_fleet_item(event: dict) -> dict:
             }
     
     conn = get_db_connection()
-    cur = conn.cursor(cursor_factory=RealDictCursor)
+    cur = conn.cursor(cursor_factory=StatsRealDictCursor)
     
     features = data.get('features', [])
     
@@ -0,0 +1,155 @@
+"""
+Статистика SQL-запросов функции: число вызовов, суммарное и максимальное время,
+количество строк по отпечатку запроса, выборки EXPLAIN для медленных запросов.
+Данные живут в памяти экземпляра функции и сбрасываются при холодном старте.
+"""
+import json
+import os
+import re
+import time
+from psycopg2.extensions import cursor as BaseCursor
+from psycopg2.extras import RealDictCursor
+
+EXPLAIN_THRESHOLD_MS = float(os.environ.get('QUERY_STATS_EXPLAIN_MS', '0') or 0)
+EXPLAIN_INTERVAL_SECONDS = float(os.environ.get('QUERY_STATS_EXPLAIN_INTERVAL_SECONDS', '60') or 0)
+DUMP_INTERVAL_SECONDS = float(os.environ.get('QUERY_STATS_DUMP_SECONDS', '300') or 0)
+
+_stats = {}
+_last_dump = time.monotonic()
+
+_STRING_RE = re.compile(r"'(?:[^']|'')*'")
+_NUMBER_RE = re.compile(r'\b\d+(?:\.\d+)?\b')
+_PARAM_LIST_RE = re.compile(r'\(\s*\?(?:\s*,\s*\?)*\s*\)')
+_SPACE_RE = re.compile(r'\s+')
+
+def fingerprint(query) -> str:
+    if isinstance(query, bytes):
+        query = query.decode('utf-8', 'replace')
+    text = _STRING_RE.sub('?', str(query))
+    text = _NUMBER_RE.sub('?', text)
+    text = text.replace('%s', '?')
+    text = _PARAM_LIST_RE.sub('(?+)', text)
+    return _SPACE_RE.sub(' ', text).strip()
+
+def record(query, elapsed_ms: float, rows: int, plan=None):
+    key = fingerprint(query)
+    entry = _stats.get(key)
+    if entry is None:
+        entry = {'query': key, 'calls': 0, 'total_ms': 0.0, 'max_ms': 0.0, 'rows': 0, 'explain': None, 'explained_at': None}
+        _stats[key] = entry
+    entry['calls'] += 1
+    entry['total_ms'] += elapsed_ms
+    entry['rows'] += max(rows, 0)
+    if elapsed_ms >= entry['max_ms']:
+        entry['max_ms'] = elapsed_ms
+        if plan is not None:
+            entry['explain'] = plan
+            entry['explained_at'] = time.monotonic()
+
+def should_explain(query, elapsed_ms: float) -> bool:
+    # Выборка: только новый максимум по отпечатку и не чаще раза в EXPLAIN_INTERVAL_SECONDS
+    if not EXPLAIN_THRESHOLD_MS or elapsed_ms < EXPLAIN_THRESHOLD_MS:
+        return False
+    entry = _stats.get(fingerprint(query))
+    if entry is None:
+        return True
+    if elapsed_ms < entry['max_ms']:
+        return False
+    explained_at = entry['explained_at']
+    return explained_at is None or time.monotonic() - explained_at >= EXPLAIN_INTERVAL_SECONDS
+
+def get_stats(include_explain: bool = False) -> list:
+    result = []
+    for entry in sorted(_stats.values(), key=lambda e: e['total_ms'], reverse=True):
+        item = {
+            'query': entry['query'],
+            'calls': entry['calls'],
+            'total_ms': round(entry['total_ms'], 3),
+            'mean_ms': round(entry['total_ms'] / entry['calls'], 3),
+            'max_ms': round(entry['max_ms'], 3),
+            'rows': entry['rows'],
+        }
+        if include_explain:
+            item['explain'] = entry['explain']
+        result.append(item)
+    return result
+
+def reset_stats():
+    _stats.clear()
+
+def maybe_dump():
+    global _last_dump
+    if not DUMP_INTERVAL_SECONDS or not _stats:
+        return
+    now = time.monotonic()
+    if now - _last_dump < DUMP_INTERVAL_SECONDS:
+        return
+    _last_dump = now
+    print(json.dumps({'query_stats': get_stats()}, ensure_ascii=False))
+
+class _StatsMixin:
+    def execute(self, query, vars=None, analyze: bool = False):
+        # analyze=True разрешает EXPLAIN ANALYZE для выборки: только для чистого чтения
+        # без FOR UPDATE и побочных эффектов; остальные запросы получают план без выполнения
+        started = time.perf_counter()
+        result = super().execute(query, vars)
+        elapsed_ms = (time.perf_counter() - started) * 1000
+        plan = None
+        if should_explain(query, elapsed_ms):
+            plan = self._explain(query, vars, analyze)
+        record(query, elapsed_ms, self.rowcount, plan)
+        return result
+
+    def _explain(self, query, vars, analyze: bool):
+        # EXPLAIN ANALYZE выполняет запрос повторно, поэтому он откатывается к точке сохранения.
+        # Обычный курсор, чтобы служебные запросы не попадали в статистику.
+        raw = BaseCursor(self.connection)
+        try:
+            statement = raw.mogrify(query, vars)
+            if analyze:
+                prefix = b'EXPLAIN (ANALYZE, BUFFERS, FORMAT JSON) '
+            else:
+                prefix = b'EXPLAIN (FORMAT JSON) '
+            raw.execute('SAVEPOINT query_stats_explain')
+            try:
+                raw.execute(prefix + statement)
+                plan = raw.fetchone()[0]
+            finally:
+                raw.execute('ROLLBACK TO SAVEPOINT query_stats_explain')
+                raw.execute('RELEASE SAVEPOINT query_stats_explain')
+            return plan
+        except Exception as e:
+            return {'error': str(e)}
+        finally:
+            raw.close()
+
+class StatsCursor(_StatsMixin, BaseCursor):
+    pass
+
+class StatsRealDictCursor(_StatsMixin, RealDictCursor):
+    pass
+
+def stats_response(event: dict) -> dict:
+    query_params = event.get('queryStringParameters') or {}
+    mode = query_params.get('stats')
+
+    if mode == 'reset':
+        # GET только читает статистику; сброс — через POST ?stats=reset
+        if event.get('httpMethod', 'GET') == 'GET':
+            return {
+                'statusCode': 405,
+                'headers': {'Content-Type': 'application/json', 'Access-Control-Allow-Origin': '*'},
+                'body': json.dumps({'error': 'Use POST to reset statistics'}),
+                'isBase64Encoded': False
+            }
+        reset_stats()
+        body = {'success': True}
+    else:
+        body = {'stats': get_stats(include_explain=(mode == 'explain'))}
+
+    return {
+        'statusCode': 200,
+        'headers': {'Content-Type': 'application/json', 'Access-Control-Allow-Origin': '*'},
+        'body': json.dumps(body, ensure_ascii=False),
+        'isBase64Encoded': False
+    }
@@ -4,10 +4,10 @@ API для управления маршрутами и тарифами тра
 import json
 import os
 import psycopg2
-from psycopg2.extras import RealDictCursor
+from query_stats import StatsCursor, StatsRealDictCursor, stats_response, maybe_dump
 
 def get_db_connection():
-    return psycopg2.connect(os.environ['DATABASE_URL'])
+    return psycopg2.connect(os.environ['DATABASE_URL'], cursor_factory=StatsCursor)
 
 def handler(event: dict, context) -> dict:
     method = event.get('httpMethod', 'GET')
@@ -26,8 +26,14 @@ def handler(event: dict, context) -> dict:
     
     try:
         if method == 'GET':
+            query_params = event.get('queryStringParameters') or {}
+            if query_params.get('stats'):
+                return stats_response(event)
             return get_routes(event)
         elif method == 'POST':
+            query_params = event.get('queryStringParameters') or {}
+            if query_params.get('stats'):
+                return stats_response(event)
             return create_route(event)
         elif method == 'PUT':
             return update_route(event)
@@ -47,10 +53,12 @@ def handler(event: dict, context) -> dict:
             'body': json.dumps({'error': str(e)}),
             'isBase64Encoded': False
         }
+    finally:
+        maybe_dump()
 
 def get_routes(event: dict) -> dict:
     conn = get_db_connection()
-    cur = conn.cursor(cursor_factory=RealDictCursor)
+    cur = conn.cursor(cursor_factory=StatsRealDictCursor)
     
     query_params = event.get('queryStringParameters') or {}
     from_loc = query_params.get('from')
@@ -60,11 +68,11 @@ def get_routes(event: dict) -> dict:
         cur.execute("""
             SELECT * FROM routes
             WHERE from_location = %s AND to_location = %s AND active = true
-        """, (from_loc, to_loc))
+        """, (from_loc, to_loc), analyze=True)
     elif query_params.get('all') == 'true':
-        cur.execute("SELECT * FROM routes ORDER BY from_location, to_location")
+        cur.execute("SELECT * FROM routes ORDER BY from_location, to_location", analyze=True)
     else:
-        cur.execute("SELECT * FROM routes WHERE active = true ORDER BY from_location, to_location")
+        cur.execute("SELECT * FROM routes WHERE active = true ORDER BY from_location, to_location", analyze=True)
     
     routes = cur.fetchall()
     cur.close()
@@ -102,7 +110,7 @@ def create_route(event: dict) -> dict:
             }
     
     conn = get_db_connection()
-    cur = conn.cursor(cursor_factory=RealDictCursor)
+    cur = conn.cursor(cursor_factory=StatsRealDictCursor)
     
     cur.execute("""
         INSERT INTO routes (from_location, to_location, base_price, distance_km, duration_minutes, active)
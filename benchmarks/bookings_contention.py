@@ -0,0 +1,106 @@
+"""
+Проверка конкурентной смены статусов заявок: много диспетчеров одновременно
+меняют одни и те же заявки через обработчик bookings.
+
+Ожидается, что каждый переход применяется ровно одним писателем, остальные
+получают 409 / conflict, а версия строки равна числу успешных переходов + 1.
+
+Запуск: DATABASE_URL=postgresql://... python benchmarks/bookings_contention.py
+"""
+import json
+import random
+import threading
+from collections import Counter
+from concurrent.futures import ThreadPoolExecutor
+from scratch_db import load_handler, scratch_schema
+
+WRITERS = 32
+BOOKINGS = 20
+ROUNDS = 200
+
+def call(handler, method: str, body: dict) -> tuple:
+    response = handler({'httpMethod': method, 'body': json.dumps(body)}, None)
+    return response['statusCode'], json.loads(response['body'])
+
+def create_bookings(handler, count: int) -> list:
+    ids = []
+    for _ in range(count):
+        status, body = call(handler, 'POST', {
+            'customer_name': 'Нагрузочный тест',
+            'customer_phone': '+70000000000',
+            'from_location': 'Аэропорт Адлер',
+            'to_location': 'Гагра',
+            'pickup_date': '2030-01-15',
+            'pickup_time': '10:00'
+        })
+        assert status == 201, body
+        ids.append(body['booking_id'])
+    return ids
+
+def run_concurrently(tasks: list) -> list:
+    barrier = threading.Barrier(len(tasks))
+    
+    def run(task):
+        barrier.wait()
+        return task()
+    
+    with ThreadPoolExecutor(max_workers=len(tasks)) as pool:
+        return list(pool.map(run, tasks))
+
+def same_version_race(handler):
+    booking_id = create_bookings(handler, 1)[0]
+    targets = ['confirmed', 'cancelled']
+    outcomes = run_concurrently([
+        lambda i=i: call(handler, 'PUT', {'id': booking_id, 'status': targets[i % 2], 'version': 1})
+        for i in range(WRITERS)
+    ])
+    codes = Counter(status for status, _ in outcomes)
+    assert codes[200] == 1 and codes[409] == WRITERS - 1, codes
+    # Проигравшие видят версию победителя, а не снимок до его записи
+    assert all(body['version'] == 2 for status, body in outcomes if status == 409), outcomes
+    print(f"одна версия, {WRITERS} писателей: {dict(codes)}")
+
+def bulk_race(handler):
+    ids = create_bookings(handler, BOOKINGS)
+    outcomes = run_concurrently([
+        lambda: call(handler, 'PUT', {'ids': ids, 'status': 'confirmed'})
+        for _ in range(WRITERS)
+    ])
+    winners = Counter()
+    for status, body in outcomes:
+        assert status == 200, body
+        for result in body['results']:
+            if result['result'] == 'updated':
+                winners[result['id']] += 1
+            else:
+                assert result['result'] == 'invalid_transition' and result['status'] == 'confirmed', result
+    assert all(winners[booking_id] == 1 for booking_id in ids), winners
+    print(f"пакетный режим, {WRITERS} писателей x {BOOKINGS} заявок: каждая подтверждена ровно один раз")
+
+def random_walk(handler, cur):
+    ids = create_bookings(handler, BOOKINGS)
+    statuses = ['confirmed', 'in_progress', 'completed', 'cancelled']
+    rng = random.Random(42)
+    plan = [(rng.choice(ids), rng.choice(statuses)) for _ in range(ROUNDS)]
+    
+    with ThreadPoolExecutor(max_workers=WRITERS) as pool:
+        outcomes = list(pool.map(lambda step: call(handler, 'PUT', {'id': step[0], 'status': step[1]}), plan))
+    
+    applied = Counter(body['id'] for status, body in outcomes if status == 200)
+    assert all(status in (200, 409) for status, _ in outcomes), Counter(s for s, _ in outcomes)
+    
+    cur.execute("SELECT id, version FROM bookings WHERE id = ANY(%s)", (ids,))
+    for booking_id, version in cur.fetchall():
+        assert version == applied[booking_id] + 1, (booking_id, version, applied[booking_id])
+        assert applied[booking_id] <= 3, (booking_id, applied[booking_id])
+    print(f"случайные переходы, {ROUNDS} запросов: применено {sum(applied.values())}, версии согласованы")
+
+def main():
+    with scratch_schema() as cur:
+        handler = load_handler('bookings')
+        same_version_race(handler)
+        bulk_race(handler)
+        random_walk(handler, cur)
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,73 @@
+"""
+Бенчмарк списка заявок: задержка GET /bookings при росте истории поездок.
+
+Скрипт создаёт временную схему, применяет миграции, наращивает историю помесячно,
+архивирует старые секции и замеряет ответ обработчика bookings. Задержка по горячим
+секциям должна оставаться ровной, тогда как ?archived=true растёт вместе с историей.
+
+Запуск: DATABASE_URL=postgresql://... python benchmarks/bookings_partitions.py
+"""
+import statistics
+import time
+from scratch_db import load_handler, scratch_schema
+
+ROWS_PER_MONTH = 2000
+HISTORY_STEPS = [0, 6, 12, 24, 48]
+KEEP_MONTHS = 3
+RUNS = 15
+
+def seed_months(cur, first_month: int, last_month: int):
+    # Месяцы отсчитываются назад от текущего: 1 — прошлый месяц и т.д.
+    cur.execute("""
+        INSERT INTO bookings
+        (customer_name, customer_phone, from_location, to_location, pickup_date, pickup_time,
+         passengers, fleet_id, route_id, total_price, status, created_at)
+        SELECT 'Бенчмарк', '+70000000000', 'Аэропорт Адлер', 'Гагра',
+               (date_trunc('month', CURRENT_DATE) - make_interval(months => m))::DATE + (n %% 28),
+               '10:00', 1, 1 + n %% 4, 1 + n %% 9, 3500,
+               CASE WHEN n %% 10 = 0 THEN 'cancelled' ELSE 'completed' END,
+               date_trunc('month', CURRENT_DATE) - make_interval(months => m) - INTERVAL '7 days'
+        FROM generate_series(%s, %s) m, generate_series(1, %s) n
+    """, (first_month, last_month, ROWS_PER_MONTH))
+
+def seed_current(cur):
+    cur.execute("""
+        INSERT INTO bookings
+        (customer_name, customer_phone, from_location, to_location, pickup_date, pickup_time,
+         passengers, fleet_id, route_id, total_price, status)
+        SELECT 'Бенчмарк', '+70000000000', 'Аэропорт Адлер', 'Гагра',
+               CURRENT_DATE + (n %% 60), '10:00', 1, 1 + n %% 4, 1 + n %% 9, 3500,
+               CASE WHEN n %% 3 = 0 THEN 'confirmed' ELSE 'pending' END
+        FROM generate_series(1, %s) n
+    """, (ROWS_PER_MONTH,))
+
+def measure(handler, params: dict) -> float:
+    timings = []
+    for _ in range(RUNS):
+        started = time.perf_counter()
+        response = handler({'httpMethod': 'GET', 'queryStringParameters': params}, None)
+        timings.append((time.perf_counter() - started) * 1000)
+        assert response['statusCode'] == 200, response['body']
+    return statistics.median(timings)
+
+def main():
+    with scratch_schema() as cur:
+        seed_current(cur)
+        handler = load_handler('bookings')
+        
+        print(f"{'история, мес':>14} {'в архиве, мес':>14} {'горячие, мс':>12} {'с архивом, мс':>14}")
+        seeded = 0
+        for months in HISTORY_STEPS:
+            if months > seeded:
+                cur.execute("SELECT bookings_ensure_partitions(3, (date_trunc('month', CURRENT_DATE) - make_interval(months => %s))::DATE)", (months,))
+                seed_months(cur, seeded + 1, months)
+                seeded = months
+            cur.execute("SELECT bookings_archive_partitions(%s)", (KEEP_MONTHS,))
+            cur.execute("SELECT COUNT(*) FROM bookings_archive")
+            archived_months = cur.fetchone()[0]
+            hot = measure(handler, {})
+            cold = measure(handler, {'archived': 'true'})
+            print(f"{months:>14} {archived_months:>14} {hot:>12.1f} {cold:>14.1f}")
+
+if __name__ == '__main__':
+    main()
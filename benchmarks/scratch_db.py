@@ -0,0 +1,50 @@
+"""
+Общие утилиты скриптов: временная схема с применёнными миграциями и загрузка обработчика функции.
+"""
+import importlib.util
+import os
+import sys
+import uuid
+from contextlib import contextmanager
+from pathlib import Path
+import psycopg2
+
+ROOT = Path(__file__).resolve().parent.parent
+MIGRATIONS = sorted((ROOT / 'db_migrations').glob('V*.sql'))
+
+def load_handler(function: str):
+    function_dir = ROOT / 'backend' / function
+    sys.path.insert(0, str(function_dir))
+    spec = importlib.util.spec_from_file_location(f'{function}_index', function_dir / 'index.py')
+    module = importlib.util.module_from_spec(spec)
+    spec.loader.exec_module(module)
+    return module.handler
+
+def with_search_path(url: str, schema: str) -> str:
+    separator = '&' if '?' in url else '?'
+    return f"{url}{separator}options=-csearch_path%3D{schema}"
+
+@contextmanager
+def scratch_schema():
+    """
+    Создаёт схему bench_*, применяет к ней миграции и направляет DATABASE_URL в неё.
+    Отдаёт курсор с autocommit; по выходе схема удаляется.
+    """
+    base_url = os.environ['DATABASE_URL']
+    schema = f"bench_{uuid.uuid4().hex[:8]}"
+    conn = psycopg2.connect(base_url)
+    conn.autocommit = True
+    cur = conn.cursor()
+    cur.execute(f"CREATE SCHEMA {schema}")
+    cur.execute(f"SET search_path TO {schema}")
+    
+    try:
+        for migration in MIGRATIONS:
+            cur.execute(migration.read_text(encoding='utf-8'))
+        os.environ['DATABASE_URL'] = with_search_path(base_url, schema)
+        yield cur
+    finally:
+        os.environ['DATABASE_URL'] = base_url
+        cur.execute(f"DROP SCHEMA {schema} CASCADE")
+        cur.close()
+        conn.close()
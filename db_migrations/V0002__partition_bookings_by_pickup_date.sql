@@ -0,0 +1,218 @@
+-- Секционирование заявок по месяцу даты подачи (pickup_date) и архив завершённых поездок
+
+-- Старую таблицу переименовываем, данные переносим в секционированную
+ALTER TABLE bookings RENAME TO bookings_legacy;
+ALTER INDEX IF EXISTS idx_bookings_status RENAME TO idx_bookings_legacy_status;
+ALTER INDEX IF EXISTS idx_bookings_date RENAME TO idx_bookings_legacy_date;
+
+CREATE TABLE IF NOT EXISTS bookings (
+    id INTEGER NOT NULL DEFAULT nextval('bookings_id_seq'),
+    customer_name VARCHAR(255) NOT NULL,
+    customer_phone VARCHAR(50) NOT NULL,
+    customer_email VARCHAR(255),
+    from_location VARCHAR(255) NOT NULL,
+    to_location VARCHAR(255) NOT NULL,
+    pickup_date DATE NOT NULL,
+    pickup_time TIME NOT NULL,
+    flight_number VARCHAR(50),
+    passengers INTEGER DEFAULT 1,
+    fleet_id INTEGER REFERENCES fleet(id),
+    route_id INTEGER REFERENCES routes(id),
+    total_price DECIMAL(10, 2),
+    status VARCHAR(50) DEFAULT 'pending',
+    notes TEXT,
+    created_at TIMESTAMP DEFAULT CURRENT_TIMESTAMP,
+    updated_at TIMESTAMP DEFAULT CURRENT_TIMESTAMP,
+    PRIMARY KEY (id, pickup_date)
+) PARTITION BY RANGE (pickup_date);
+
+-- Последовательность id переходит к новой таблице, чтобы пережить удаление старой
+ALTER SEQUENCE bookings_id_seq OWNED BY bookings.id;
+
+-- Секция по умолчанию принимает даты, для которых месячная секция ещё не создана
+CREATE TABLE IF NOT EXISTS bookings_default PARTITION OF bookings DEFAULT;
+
+CREATE INDEX IF NOT EXISTS idx_bookings_status ON bookings(status);
+CREATE INDEX IF NOT EXISTS idx_bookings_date ON bookings(pickup_date);
+CREATE INDEX IF NOT EXISTS idx_bookings_created ON bookings(created_at DESC);
+
+-- Холодный архив: одна строка на месяц, заявки хранятся массивом JSONB.
+-- Значение занимает больше пары килобайт, поэтому PostgreSQL сжимает его в TOAST по умолчанию
+CREATE TABLE IF NOT EXISTS bookings_archive (
+    month DATE PRIMARY KEY,
+    rows_count INTEGER NOT NULL,
+    payload JSONB NOT NULL,
+    archived_at TIMESTAMP DEFAULT CURRENT_TIMESTAMP
+);
+
+-- Создаёт секцию месяца, в который попадает day, если её ещё нет.
+-- Строки из секции по умолчанию, попадающие в этот месяц, переносятся в новую секцию.
+-- Секции создаются только в окне от текущего месяца - 3 до текущего + 12
+-- (совпадает с PARTITION_MONTHS_AHEAD в backend/bookings/index.py); даты вне окна
+-- остаются в секции по умолчанию, чтобы произвольная дата не порождала новую таблицу.
+-- Возвращает FALSE, если месяц уже перенесён в архив: такие заявки принимать нельзя.
+CREATE OR REPLACE FUNCTION bookings_ensure_partition(day DATE)
+RETURNS BOOLEAN AS $$
+DECLARE
+    month_start DATE;
+    month_end DATE;
+    part_name TEXT;
+BEGIN
+    month_start := date_trunc('month', day)::DATE;
+    month_end := (month_start + INTERVAL '1 month')::DATE;
+    part_name := 'bookings_' || to_char(month_start, 'YYYY_MM');
+
+    IF to_regclass(part_name) IS NOT NULL THEN
+        RETURN TRUE;
+    END IF;
+    IF EXISTS (SELECT 1 FROM bookings_archive WHERE month = month_start) THEN
+        RETURN FALSE;
+    END IF;
+    IF month_start < (date_trunc('month', CURRENT_DATE) - INTERVAL '3 months')::DATE
+       OR month_start > (date_trunc('month', CURRENT_DATE) + INTERVAL '12 months')::DATE THEN
+        RETURN TRUE;
+    END IF;
+
+    -- Параллельные заявки на новый месяц создают секцию по очереди
+    PERFORM pg_advisory_xact_lock(hashtext('bookings_partitions'));
+
+    IF EXISTS (SELECT 1 FROM bookings_archive WHERE month = month_start) THEN
+        RETURN FALSE;
+    END IF;
+    IF to_regclass(part_name) IS NOT NULL THEN
+        RETURN TRUE;
+    END IF;
+
+    EXECUTE format(
+        'CREATE TABLE %I (LIKE bookings INCLUDING DEFAULTS INCLUDING CONSTRAINTS)',
+        part_name
+    );
+    EXECUTE format(
+        'WITH moved AS (DELETE FROM bookings_default WHERE pickup_date >= %L AND pickup_date < %L RETURNING *)
+         INSERT INTO %I SELECT * FROM moved',
+        month_start, month_end, part_name
+    );
+    EXECUTE format(
+        'ALTER TABLE bookings ATTACH PARTITION %I FOR VALUES FROM (%L) TO (%L)',
+        part_name, month_start, month_end
+    );
+    RETURN TRUE;
+END;
+$$ LANGUAGE plpgsql;
+
+-- Создаёт месячные секции от месяца from_month до текущего + months_ahead, пропуская архивные.
+-- Более ранние и более поздние месяцы отсекаются окном bookings_ensure_partition.
+CREATE OR REPLACE FUNCTION bookings_ensure_partitions(months_ahead INTEGER DEFAULT 3, from_month DATE DEFAULT NULL)
+RETURNS INTEGER AS $$
+DECLARE
+    month_start DATE;
+    last_month DATE;
+    created INTEGER := 0;
+BEGIN
+    month_start := GREATEST(
+        date_trunc('month', COALESCE(from_month, CURRENT_DATE)),
+        date_trunc('month', CURRENT_DATE) - INTERVAL '3 months'
+    )::DATE;
+    last_month := (date_trunc('month', CURRENT_DATE) + make_interval(months => LEAST(GREATEST(months_ahead, 0), 12)))::DATE;
+
+    WHILE month_start <= last_month LOOP
+        IF to_regclass('bookings_' || to_char(month_start, 'YYYY_MM')) IS NULL
+           AND bookings_ensure_partition(month_start) THEN
+            created := created + 1;
+        END IF;
+        month_start := (month_start + INTERVAL '1 month')::DATE;
+    END LOOP;
+
+    RETURN created;
+END;
+$$ LANGUAGE plpgsql;
+
+-- Отсоединяет месячные секции старше keep_months и сворачивает их в bookings_archive.
+-- Туда же уходят старые строки секции по умолчанию. Месяц архивируется,
+-- только если в нём не осталось заявок в работе.
+CREATE OR REPLACE FUNCTION bookings_archive_partitions(keep_months INTEGER DEFAULT 3)
+RETURNS INTEGER AS $$
+DECLARE
+    cutoff DATE;
+    part RECORD;
+    part_month DATE;
+    archived INTEGER := 0;
+    active_left BOOLEAN;
+BEGIN
+    PERFORM pg_advisory_xact_lock(hashtext('bookings_partitions'));
+
+    cutoff := (date_trunc('month', CURRENT_DATE) - make_interval(months => GREATEST(keep_months, 3)))::DATE;
+
+    FOR part IN
+        SELECT c.relname
+        FROM pg_inherits i
+        JOIN pg_class c ON c.oid = i.inhrelid
+        WHERE i.inhparent = 'bookings'::regclass AND c.relname ~ '^bookings_[0-9]{4}_[0-9]{2}$'
+        ORDER BY c.relname
+    LOOP
+        part_month := to_date(substring(part.relname FROM 10), 'YYYY_MM');
+        CONTINUE WHEN part_month >= cutoff;
+
+        EXECUTE format(
+            'SELECT EXISTS (SELECT 1 FROM %I WHERE status NOT IN (''completed'', ''cancelled''))',
+            part.relname
+        ) INTO active_left;
+        CONTINUE WHEN active_left;
+
+        EXECUTE format('ALTER TABLE bookings DETACH PARTITION %I', part.relname);
+        EXECUTE format(
+            'INSERT INTO bookings_archive (month, rows_count, payload)
+             SELECT %L, count(*), COALESCE(jsonb_agg(to_jsonb(t) ORDER BY t.id), ''[]''::jsonb) FROM %I t
+             ON CONFLICT (month) DO UPDATE
+             SET rows_count = bookings_archive.rows_count + EXCLUDED.rows_count,
+                 payload = bookings_archive.payload || EXCLUDED.payload,
+                 archived_at = CURRENT_TIMESTAMP',
+            part_month, part.relname
+        );
+        EXECUTE format('DROP TABLE %I', part.relname);
+        archived := archived + 1;
+    END LOOP;
+
+    FOR part_month IN
+        SELECT DISTINCT date_trunc('month', pickup_date)::DATE
+        FROM bookings_default
+        WHERE pickup_date < cutoff
+        ORDER BY 1
+    LOOP
+        CONTINUE WHEN EXISTS (
+            SELECT 1 FROM bookings_default
+            WHERE pickup_date >= part_month AND pickup_date < (part_month + INTERVAL '1 month')::DATE
+              AND status NOT IN ('completed', 'cancelled')
+        );
+
+        WITH moved AS (
+            DELETE FROM bookings_default
+            WHERE pickup_date >= part_month AND pickup_date < (part_month + INTERVAL '1 month')::DATE
+            RETURNING *
+        )
+        INSERT INTO bookings_archive (month, rows_count, payload)
+        SELECT part_month, count(*), COALESCE(jsonb_agg(to_jsonb(moved) ORDER BY moved.id), '[]'::jsonb) FROM moved
+        ON CONFLICT (month) DO UPDATE
+        SET rows_count = bookings_archive.rows_count + EXCLUDED.rows_count,
+            payload = bookings_archive.payload || EXCLUDED.payload,
+            archived_at = CURRENT_TIMESTAMP;
+        archived := archived + 1;
+    END LOOP;
+
+    RETURN archived;
+END;
+$$ LANGUAGE plpgsql;
+
+-- Секции на окно вокруг текущего месяца; более старая история попадает в секцию
+-- по умолчанию и сразу сворачивается в архив
+SELECT bookings_ensure_partitions(3, (SELECT MIN(pickup_date) FROM bookings_legacy));
+
+INSERT INTO bookings
+SELECT id, customer_name, customer_phone, customer_email, from_location, to_location,
+       pickup_date, pickup_time, flight_number, passengers, fleet_id, route_id,
+       total_price, status, notes, created_at, updated_at
+FROM bookings_legacy;
+
+DROP TABLE bookings_legacy;
+
+SELECT bookings_archive_partitions(3);
@@ -0,0 +1,2 @@
+-- Версия строки заявки для оптимистичной блокировки при смене статуса
+ALTER TABLE bookings ADD COLUMN IF NOT EXISTS version INTEGER NOT NULL DEFAULT 1;
@@ -16,6 +16,23 @@ const API_URLS = {
   fleet: 'https://functions.poehali.dev/2e4efa94-1c37-4f70-9e50-f3215e11e584',
 };
 
+const STATUS_LABELS: Record<string, string> = {
+  pending: 'Pending',
+  confirmed: 'Confirmed',
+  in_progress: 'In progress',
+  completed: 'Completed',
+  cancelled: 'Cancelled',
+};
+
+// Должно совпадать с STATUS_TRANSITIONS в backend/bookings/index.py
+const STATUS_TRANSITIONS: Record<string, string[]> = {
+  pending: ['confirmed', 'cancelled'],
+  confirmed: ['in_progress', 'cancelled'],
+  in_progress: ['completed', 'cancelled'],
+  completed: [],
+  cancelled: [],
+};
+
 interface Booking {
   id: number;
   customer_name: string;
@@ -26,6 +43,7 @@ interface Booking {
   pickup_time: string;
   total_price: number;
   status: string;
+  version?: number;
   fleet_name?: string;
 }
 
@@ -110,18 +128,21 @@ export default function Admin() {
     }
   };
 
-  const updateBookingStatus = async (bookingId: number, status: string) => {
+  const updateBookingStatus = async (bookingId: number, status: string, version?: number) => {
     setLoading(true);
     try {
       const response = await fetch(API_URLS.bookings, {
         method: 'PUT',
         headers: { 'Content-Type': 'application/json' },
-        body: JSON.stringify({ id: bookingId, status }),
+        body: JSON.stringify({ id: bookingId, status, version }),
       });
 
       if (response.ok) {
         toast({ title: 'Статус обновлён', description: `Заявка #${bookingId} обновлена` });
         fetchBookings();
+      } else if (response.status === 409) {
+        toast({ title: 'Конфликт', description: 'Заявку уже изменили или переход статуса недопустим', variant: 'destructive' });
+        fetchBookings();
       } else {
         toast({ title: 'Ошибка', description: 'Не удалось обновить статус', variant: 'destructive' });
       }
@@ -256,6 +277,7 @@ export default function Admin() {
     const variants: Record<string, 'default' | 'secondary' | 'destructive' | 'outline'> = {
       pending: 'secondary',
       confirmed: 'default',
+      in_progress: 'default',
       completed: 'outline',
       cancelled: 'destructive',
     };
@@ -327,16 +349,21 @@ export default function Admin() {
                         <TableCell>
                           <Select
                             value={booking.status}
-                            onValueChange={(value) => updateBookingStatus(booking.id, value)}
+                            onValueChange={(value) => updateBookingStatus(booking.id, value, booking.version)}
+                            disabled={!(STATUS_TRANSITIONS[booking.status] || []).length}
                           >
                             <SelectTrigger className="w-32 bg-white/20 border-gold/30 text-white">
                               <SelectValue />
                             </SelectTrigger>
                             <SelectContent>
-                              <SelectItem value="pending">Pending</SelectItem>
-                              <SelectItem value="confirmed">Confirmed</SelectItem>
-                              <SelectItem value="completed">Completed</SelectItem>
-                              <SelectItem value="cancelled">Cancelled</SelectItem>
+                              <SelectItem value={booking.status} disabled>
+                                {STATUS_LABELS[booking.status] || booking.status}
+                              </SelectItem>
+                              {(STATUS_TRANSITIONS[booking.status] || []).map((next) => (
+                                <SelectItem key={next} value={next}>
+                                  {STATUS_LABELS[next]}
+                                </SelectItem>
+                              ))}
                             </SelectContent>
                           </Select>
                         </TableCell>